@@ -1,35 +1,61 @@
 #!/usr/bin/env python3
 """
 Execute D1 migration in smaller batches to avoid command line size limits
+
+Requires CLOUDFLARE_ACCOUNT_ID and CLOUDFLARE_API_TOKEN (with D1 edit access);
+CLOUDFLARE_D1_DATABASE_ID defaults to the database in wrangler.jsonc.
 """
-import subprocess
+import itertools
+import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Batches run concurrently against the D1 REST API
+MAX_WORKERS = 8
+
+# cf-demo-db, as configured in wrangler.jsonc
+DEFAULT_DATABASE_ID = "98a44c4d-b845-4fae-a969-8e67211c90ac"
+
+D1_QUERY_URL = "https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}/query"
+
+STATEMENT_MARKER = "INSERT OR IGNORE INTO videos"
 
-def execute_batch(batch_sql, batch_num, total_batches):
+# Each statement runs from one marker up to the next (or end of file), matching
+# the old split-on-marker behaviour without building intermediate lists
+STATEMENT_PATTERN = re.compile(re.escape(STATEMENT_MARKER) + r".*?(?=" + re.escape(STATEMENT_MARKER) + r"|\Z)", re.DOTALL)
+
+def iter_statements(content):
+    """Yield INSERT statements from the SQL content one at a time"""
+    for match in STATEMENT_PATTERN.finditer(content):
+        yield match.group(0).strip()
+
+def create_session(api_token):
+    """Create one pooled session shared by every batch worker"""
+    session = requests.Session()
+    session.headers.update({'Authorization': f'Bearer {api_token}'})
+    adapter = HTTPAdapter(pool_maxsize=MAX_WORKERS)
+    session.mount('https://', adapter)
+    return session
+
+def execute_batch(session, query_url, batch_sql, batch_num, total_batches):
     """Execute a batch of SQL statements"""
     print(f"Executing batch {batch_num}/{total_batches}...")
     
     try:
-        # Create a temporary file for this batch
-        temp_file = f"/tmp/batch_{batch_num}.sql"
-        with open(temp_file, 'w') as f:
-            f.write(batch_sql)
+        # POST the batch straight to the D1 REST API instead of spawning wrangler
+        response = session.post(query_url, json={'sql': batch_sql}, timeout=60)
+        result = response.json()
         
-        # Execute the batch using the file approach
-        cmd = [
-            "npx", "wrangler", "d1", "execute", "cf-demo-db", 
-            "--file=" + temp_file, "--remote"
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
+        if response.status_code == 200 and result.get('success'):
             print(f"✅ Batch {batch_num} executed successfully")
             return True
         else:
             print(f"❌ Batch {batch_num} failed:")
-            print(f"STDOUT: {result.stdout}")
-            print(f"STDERR: {result.stderr}")
+            print(f"HTTP {response.status_code}: {result.get('errors')}")
             return False
             
     except Exception as e:
@@ -37,34 +63,78 @@ def execute_batch(batch_sql, batch_num, total_batches):
         return False
 
 def main():
+    account_id = os.environ.get('CLOUDFLARE_ACCOUNT_ID')
+    api_token = os.environ.get('CLOUDFLARE_API_TOKEN')
+    database_id = os.environ.get('CLOUDFLARE_D1_DATABASE_ID', DEFAULT_DATABASE_ID)
+    if not account_id or not api_token:
+        print("❌ CLOUDFLARE_ACCOUNT_ID and CLOUDFLARE_API_TOKEN must be set")
+        return False
+    
+    query_url = D1_QUERY_URL.format(account_id=account_id, database_id=database_id)
+    session = create_session(api_token)
+    
     # Read the complete SQL file
     with open("db/mutations/insert_videos_migrated_ignore.sql", "r") as f:
         content = f.read()
     
-    # Split into individual INSERT statements
-    statements = [stmt.strip() for stmt in content.split("INSERT OR IGNORE INTO videos") if stmt.strip()]
-    
-    # Add "INSERT OR IGNORE INTO videos" back to each statement
-    statements = ["INSERT OR IGNORE INTO videos" + stmt for stmt in statements]
-    
-    print(f"Total INSERT statements to execute: {len(statements)}")
+    statement_count = content.count(STATEMENT_MARKER)
+    print(f"Total INSERT statements to execute: {statement_count}")
     
     # Process in batches of 50
     batch_size = 50
-    total_batches = (len(statements) + batch_size - 1) // batch_size
+    total_batches = (statement_count + batch_size - 1) // batch_size
     
     success_count = 0
+    statements = iter_statements(content)
+    
+    # Batches are independent (INSERT OR IGNORE), so run several requests
+    # at once. No more batches are submitted than there are workers, so
+    # nothing sits queued behind a failure and the statement stream stays lazy.
+    max_in_flight = MAX_WORKERS
     
-    for i in range(0, len(statements), batch_size):
-        batch_num = (i // batch_size) + 1
-        batch = statements[i:i + batch_size]
-        batch_sql = "\n".join(batch)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {}
+        failed_batch = None
         
-        if execute_batch(batch_sql, batch_num, total_batches):
-            success_count += 1
-        else:
-            print(f"Stopping execution due to batch {batch_num} failure")
-            break
+        def collect(done):
+            """Tally finished batches; on the first failure cancel everything not yet started"""
+            nonlocal success_count, failed_batch
+            for future in done:
+                batch_num = pending.pop(future)
+                if future.cancelled():
+                    continue
+                if future.result():
+                    success_count += 1
+                elif failed_batch is None:
+                    failed_batch = batch_num
+                    for other in pending:
+                        other.cancel()
+        
+        for batch_num in itertools.count(1):
+            # Pick up batches that already finished so a failure stops
+            # submission right away, not only once the queue is full
+            collect([f for f in pending if f.done()])
+            if failed_batch is not None:
+                break
+            
+            batch = list(itertools.islice(statements, batch_size))
+            if not batch:
+                break
+            batch_sql = "\n".join(batch)
+            
+            future = executor.submit(execute_batch, session, query_url, batch_sql, batch_num, total_batches)
+            pending[future] = batch_num
+            
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                if failed_batch is not None:
+                    break
+        
+        collect(as_completed(pending))
+    
+    if failed_batch is not None:
+        print(f"Stopping execution due to batch {failed_batch} failure")
     
     print(f"\nMigration Summary:")
     print(f"Total batches: {total_batches}")
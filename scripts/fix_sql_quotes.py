@@ -4,46 +4,51 @@ Fix SQL statement quotes for remote D1 execution
 """
 import re
 
+# Start of a statement whose VALUES tuple is fixed; statements begin a line,
+# so the next match also marks where the current statement's tuple must end
+STATEMENT_START_PATTERN = re.compile(r"^INSERT OR IGNORE INTO videos[^;]*?VALUES\s*\(", re.MULTILINE)
+
+# One value in the tuple and the "," or ")" after it. A string literal closes
+# at the first quote followed by "," or ")" that isn't half of a doubled ''
+# pair; anything else is a bare value such as a number or NULL
+TUPLE_VALUE_PATTERN = re.compile(r"\s*(?:'(?P<literal>(?:''|'(?!')(?!\s*[,)])|[^'])*)'|[^',()]*)\s*(?P<sep>[,)])")
+
+# A quote inside a literal: an already-doubled pair, or a lone quote
+LITERAL_QUOTE_PATTERN = re.compile(r"''?")
+
 def fix_sql_quotes(content):
     """
     Fix unescaped single quotes in SQL VALUES by doubling them
+
+    Only string literals inside the VALUES tuple of each INSERT OR IGNORE INTO
+    videos statement are touched; delimiters, already-escaped '' pairs and
+    everything outside those tuples are kept as they are.
     """
-    # Read line by line and fix each INSERT statement
-    lines = content.split('\n')
-    fixed_lines = []
-    
-    current_statement = ""
-    in_values = False
-    
-    for line in lines:
-        if line.strip().startswith("INSERT OR IGNORE INTO videos"):
-            # Start of new statement
-            if current_statement:
-                fixed_lines.append(current_statement)
-            current_statement = line
-            in_values = True
-        elif in_values:
-            current_statement += "\n" + line
-            if line.strip().endswith(';'):
-                # End of statement, fix quotes in the VALUES part
-                if "VALUES (" in current_statement:
-                    # Extract VALUES part and fix quotes
-                    parts = current_statement.split("VALUES (", 1)
-                    if len(parts) == 2:
-                        values_part = "VALUES (" + parts[1]
-                        # Fix single quotes by doubling them
-                        fixed_values = values_part.replace("'", "''")
-                        current_statement = parts[0] + fixed_values
-                
-                fixed_lines.append(current_statement)
-                current_statement = ""
-                in_values = False
+    starts = list(STATEMENT_START_PATTERN.finditer(content))
+    ends = [m.start() for m in starts[1:]] + [len(content)]
+    parts = []
+    pos = 0
     
-    # Add any remaining statement
-    if current_statement:
-        fixed_lines.append(current_statement)
+    for start, end in zip(starts, ends):
+        parts.append(content[pos:start.end()])
+        pos = start.end()
+        
+        # Walk the tuple one value at a time from the front, never past the
+        # next statement, so a literal that never closes costs one scan of
+        # its own statement and the rest of that statement is left untouched
+        while value := TUPLE_VALUE_PATTERN.match(content, pos, end):
+            if value.group('literal') is not None:
+                parts.append(content[pos:value.start('literal')])
+                parts.append(LITERAL_QUOTE_PATTERN.sub("''", value.group('literal')))
+                parts.append(content[value.end('literal'):value.end()])
+            else:
+                parts.append(content[pos:value.end()])
+            pos = value.end()
+            if value.group('sep') == ')':
+                break
     
-    return "\n".join(fixed_lines)
+    parts.append(content[pos:])
+    return ''.join(parts)
 
 def main():
     # Read the original file
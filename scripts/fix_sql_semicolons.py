@@ -2,32 +2,33 @@
 """
 Fix missing semicolons in SQL INSERT statements
 """
+import re
+
+# Trailing whitespace on any line (the old per-line rstrip)
+TRAILING_WHITESPACE = re.compile(r"[ \t\r\f\v]+$", re.MULTILINE)
+
+# An INSERT line that does not already end with a semicolon
+MISSING_SEMICOLON = re.compile(r"^([ \t]*INSERT INTO videos.*)(?<!;)$", re.MULTILINE)
 
 def fix_sql_file(input_file, output_file):
     """Add semicolons to INSERT statements that are missing them"""
     
     with open(input_file, 'r') as f:
-        lines = f.readlines()
+        content = f.read()
     
-    fixed_lines = []
-    for line in lines:
-        line = line.rstrip()
-        
-        # Check if this line is an INSERT statement
-        if line.strip().startswith('INSERT INTO videos'):
-            # Add semicolon if not present
-            if not line.strip().endswith(';'):
-                line = line.rstrip() + ';'
-        
-        fixed_lines.append(line)
+    # Two regex passes over the whole file instead of a Python loop per line
+    fixed = TRAILING_WHITESPACE.sub('', content)
+    fixed = MISSING_SEMICOLON.sub(r'\1;', fixed)
+    if fixed and not fixed.endswith('\n'):
+        fixed += '\n'
     
     # Write to output file
     with open(output_file, 'w') as f:
-        for line in fixed_lines:
-            f.write(line + '\n')
+        f.write(fixed)
     
+    line_count = fixed.count('\n')
     print(f"✅ Fixed SQL file: {output_file}")
-    print(f"   Total lines: {len(fixed_lines)}")
+    print(f"   Total lines: {line_count}")
 
 if __name__ == "__main__":
     input_file = "db/mutations/insert_videos_migrated.sql"
@@ -2,18 +2,23 @@
 """
 REST API-based migration script for moving videos from SQLite to D1
 Uses the REST API endpoints to insert data in batches
+
+Requires aiohttp (pip install aiohttp).
 """
 
 import sqlite3
-import requests
+import aiohttp
+import asyncio
 import json
-import time
 import sys
 import argparse
-from pathlib import Path
-from typing import List, Dict, Any, Tuple
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Iterator
 import logging
 
+from source_db import open_source_db
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +26,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Maximum number of bound parameters D1 accepts in a single query
+D1_MAX_BOUND_PARAMS = 100
+
+# Number of batches sent to the API concurrently
+MAX_CONCURRENT_BATCHES = 16
+
+# Keep-alive connections held open to the API
+CONNECTION_POOL_SIZE = 32
+
+# Retry policy for rate-limited and transient HTTP failures. 500 is left out:
+# the worker returns it for every SQL error, which would fail again on retry
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.2
+
 class D1VideoMigration:
     def __init__(self, source_db: str, api_url: str, auth_token: str, batch_size: int = 50):
         self.source_db = source_db
@@ -36,8 +56,12 @@ class D1VideoMigration:
             'total': 0,
             'successful': 0,
             'failed': 0,
-            'skipped': 0
+            'skipped': 0,
+            # Skipped rows from chunks that were resent after a timeout or
+            # dropped connection; the lost attempt may have inserted them
+            'skipped_after_retry': 0
         }
+        self._session = None
         
     def validate_row(self, row: Dict[str, Any]) -> Tuple[bool, str]:
         """Validate a single row of data"""
@@ -70,161 +94,204 @@ class D1VideoMigration:
             'created_at': row.get('created_at')
         }
     
-    def check_video_exists(self, video_id: str) -> bool:
-        """Check if a video already exists in D1"""
-        query = "SELECT COUNT(*) as count FROM videos WHERE video_id = ?"
+    async def _post_query(self, payload: Dict[str, Any], timeout: float) -> Tuple[Dict[str, Any], bool]:
+        """POST to the query endpoint, retrying rate-limited and transient failures.
+        
+        Retrying keeps the data correct because every write is an INSERT OR
+        IGNORE, but not the counts: after a timeout or dropped connection the
+        lost attempt may already have committed, so the retry reports those
+        rows as unchanged. The returned flag is True when that may have happened.
+        """
+        resent = False
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self._session.post(
+                    f"{self.api_url}/query",
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                        if response.status != 200:
+                            raise RuntimeError(f"HTTP {response.status}: {await response.text()}")
+                        return await response.json(), resent
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                # Dropped keep-alive connections and timeouts are transient too
+                if attempt == MAX_RETRIES:
+                    raise
+                resent = True
+            
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+    
+    async def bulk_insert_videos(self, videos: List[Dict[str, Any]]) -> Tuple[int, bool]:
+        """Insert videos with a single multi-row INSERT OR IGNORE.
+        
+        Returns the rows changed and whether the request had to be resent
+        after an attempt that may have reached the server.
+        """
+        cols = list(videos[0].keys())
+        row_placeholders = '(' + ','.join(['?'] * len(cols)) + ')'
+        placeholders = ','.join(row_placeholders for _ in videos)
+        params = [v[c] for v in videos for c in cols]
         payload = {
-            'query': query,
-            'params': [video_id]
+            'query': f"INSERT OR IGNORE INTO videos ({','.join(cols)}) VALUES {placeholders}",
+            'params': params
         }
         
-        try:
-            response = requests.post(
-                f"{self.api_url}/query",
-                headers=self.headers,
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                count = result.get('results', [{}])[0].get('count', 0)
-                return count > 0
-            else:
-                logger.warning(f"Failed to check existence for {video_id}: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            logger.warning(f"Error checking existence for {video_id}: {e}")
-            return False
+        result, resent = await self._post_query(payload, timeout=30)
+        return result.get('meta', {}).get('changes', len(videos)), resent
     
-    def insert_video_batch(self, videos: List[Dict[str, Any]]) -> Tuple[int, int]:
-        """Insert a batch of videos using the REST API"""
+    async def insert_video_batch(self, videos: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Insert a batch of videos using multi-row INSERT statements via the query endpoint"""
         successful = 0
         failed = 0
         
-        for video in videos:
+        # D1 caps bound parameters per query, so split the batch into as few
+        # statements as that limit allows
+        rows_per_statement = max(1, D1_MAX_BOUND_PARAMS // len(videos[0]))
+        
+        for i in range(0, len(videos), rows_per_statement):
+            chunk = videos[i:i + rows_per_statement]
             try:
-                # Check if video already exists
-                if self.check_video_exists(video['video_id']):
-                    logger.info(f"Skipping existing video: {video['video_id']}")
-                    self.stats['skipped'] += 1
-                    continue
-                
-                response = requests.post(
-                    f"{self.api_url}/rest/videos",
-                    headers=self.headers,
-                    json=video,
-                    timeout=30
-                )
-                
-                if response.status_code in [200, 201]:
-                    successful += 1
-                    logger.debug(f"Successfully inserted video: {video['video_id']}")
-                else:
-                    failed += 1
-                    error_msg = f"HTTP {response.status_code}: {response.text}"
+                changes, resent = await self.bulk_insert_videos(chunk)
+                successful += changes
+                # INSERT OR IGNORE silently drops rows that already exist
+                self.stats['skipped'] += len(chunk) - changes
+                if resent and changes < len(chunk):
+                    self.stats['skipped_after_retry'] += len(chunk) - changes
+                    logger.warning(f"Resent {len(chunk)} videos starting at {chunk[0]['video_id']} after a "
+                                   f"lost response; {len(chunk) - changes} reported as skipped may have been "
+                                   f"inserted by the first attempt")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Successfully inserted {changes} videos")
+                    
+            except Exception as e:
+                failed += len(chunk)
+                error_msg = str(e)
+                for video in chunk:
                     self.errors.append({
                         'video_id': video['video_id'],
                         'error': error_msg
                     })
-                    logger.error(f"Failed to insert video {video['video_id']}: {error_msg}")
-                    
-            except Exception as e:
-                failed += 1
-                error_msg = str(e)
-                self.errors.append({
-                    'video_id': video['video_id'],
-                    'error': error_msg
-                })
-                logger.error(f"Error inserting video {video['video_id']}: {error_msg}")
+                logger.error(f"Error inserting {len(chunk)} videos starting at {chunk[0]['video_id']}: {error_msg}")
         
         return successful, failed
     
-    def fetch_videos_from_sqlite(self) -> List[Dict[str, Any]]:
-        """Fetch all videos from SQLite database"""
+    def fetch_videos_from_sqlite(self) -> Iterator[Dict[str, Any]]:
+        """Stream videos from SQLite database one row at a time"""
         logger.info(f"Fetching videos from {self.source_db}")
-        conn = sqlite3.connect(self.source_db)
+        conn = open_source_db(self.source_db)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
+        cursor.arraysize = self.batch_size
         
-        # Query all videos with the same structure as D1
-        cursor.execute("""
-            SELECT 
-                video_id,
-                cleaned_title,
-                cleaned_description,
-                channel_name,
-                channel_id,
-                published_at,
-                duration_seconds,
-                view_count,
-                like_count,
-                comment_count,
-                is_indexed,
-                created_at
-            FROM videos
-            ORDER BY created_at DESC
-        """)
-        
-        videos = []
-        for row in cursor:
-            video = dict(row)
-            videos.append(video)
-        
-        conn.close()
-        logger.info(f"Fetched {len(videos)} videos from SQLite")
-        return videos
+        try:
+            # Query all videos with the same structure as D1
+            cursor.execute("""
+                SELECT 
+                    video_id,
+                    cleaned_title,
+                    cleaned_description,
+                    channel_name,
+                    channel_id,
+                    published_at,
+                    duration_seconds,
+                    view_count,
+                    like_count,
+                    comment_count,
+                    is_indexed,
+                    created_at
+                FROM videos
+                ORDER BY created_at DESC
+            """)
+            
+            for row in cursor:
+                yield dict(row)
+        finally:
+            conn.close()
     
-    def migrate(self) -> Dict[str, int]:
+    async def migrate(self) -> Dict[str, int]:
         """Execute the complete migration"""
         logger.info("Starting D1 video migration via REST API")
         
-        # Fetch all videos from SQLite
-        videos = self.fetch_videos_from_sqlite()
-        self.stats['total'] = len(videos)
+        loop = asyncio.get_running_loop()
+        # Stream videos from SQLite on a dedicated thread (sqlite3 connections are
+        # bound to the thread that opened them) so reads never block the event loop
+        reader = ThreadPoolExecutor(max_workers=1)
+        videos = iter(self.fetch_videos_from_sqlite())
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
         
-        if not videos:
-            logger.warning("No videos found to migrate")
-            return self.stats
+        async def process_batch(batch_num: int, batch: List[Dict[str, Any]]):
+            try:
+                batch_successful, batch_failed = await self._process_batch(batch_num, batch)
+                logger.info(f"Batch {batch_num} completed: {batch_successful} successful, {batch_failed} failed")
+            finally:
+                semaphore.release()
         
-        # Process videos in batches
-        for i in range(0, len(videos), self.batch_size):
-            batch = videos[i:i + self.batch_size]
-            batch_num = (i // self.batch_size) + 1
-            total_batches = (len(videos) + self.batch_size - 1) // self.batch_size
-            
-            logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} videos)")
-            
-            # Validate and transform batch
-            valid_videos = []
-            for video in batch:
-                is_valid, error_msg = self.validate_row(video)
-                if is_valid:
-                    transformed = self.transform_row(video)
-                    valid_videos.append(transformed)
-                else:
-                    self.stats['failed'] += 1
-                    self.errors.append({
-                        'video_id': video.get('video_id', 'UNKNOWN'),
-                        'error': error_msg
-                    })
-                    logger.error(f"Validation failed for video {video.get('video_id')}: {error_msg}")
-            
-            if valid_videos:
-                # Insert batch
-                batch_successful, batch_failed = self.insert_video_batch(valid_videos)
-                self.stats['successful'] += batch_successful
-                self.stats['failed'] += batch_failed
+        # One keep-alive connection pool shared by every in-flight request, so
+        # TCP/TLS handshakes happen once per connection rather than once per call
+        connector = aiohttp.TCPConnector(limit=CONNECTION_POOL_SIZE)
+        try:
+            async with aiohttp.ClientSession(headers=self.headers, connector=connector) as self._session:
+                # Finished tasks drop out of the set, so memory follows the number
+                # of batches in flight rather than the number of batches overall
+                tasks = set()
+                batch_num = 0
+                while batch := await loop.run_in_executor(
+                    reader, lambda: list(itertools.islice(videos, self.batch_size))
+                ):
+                    batch_num += 1
+                    self.stats['total'] += len(batch)
+                    # Wait for a free slot before reading further, so only a bounded
+                    # number of batches is ever held in memory
+                    await semaphore.acquire()
+                    task = asyncio.create_task(process_batch(batch_num, batch))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
                 
-                logger.info(f"Batch {batch_num} completed: {batch_successful} successful, {batch_failed} failed")
-            
-            # Rate limiting - small delay between batches
-            if i + self.batch_size < len(videos):
-                time.sleep(0.5)
+                # Only the batches still in flight are left to wait for
+                await asyncio.gather(*tasks)
+        finally:
+            # Close the SQLite connection on the thread that opened it
+            await loop.run_in_executor(reader, videos.close)
+            reader.shutdown()
+            self._session = None
+        
+        if not self.stats['total']:
+            logger.warning("No videos found to migrate")
         
         return self.stats
     
+    async def _process_batch(self, batch_num: int, batch: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Validate, transform and insert a single batch"""
+        logger.info(f"Processing batch {batch_num} ({len(batch)} videos)")
+        
+        # Validate and transform batch
+        valid_videos = []
+        invalid = 0
+        for video in batch:
+            is_valid, error_msg = self.validate_row(video)
+            if is_valid:
+                transformed = self.transform_row(video)
+                valid_videos.append(transformed)
+            else:
+                invalid += 1
+                self.errors.append({
+                    'video_id': video.get('video_id', 'UNKNOWN'),
+                    'error': error_msg
+                })
+                logger.error(f"Validation failed for video {video.get('video_id')}: {error_msg}")
+        self.stats['failed'] += invalid
+        
+        # Existing videos are dropped server-side by INSERT OR IGNORE and
+        # counted as skipped from the reported changes
+        batch_successful = batch_failed = 0
+        if valid_videos:
+            batch_successful, batch_failed = await self.insert_video_batch(valid_videos)
+            self.stats['successful'] += batch_successful
+            self.stats['failed'] += batch_failed
+        
+        return batch_successful, batch_failed + invalid
+    
     def report_results(self):
         """Generate comprehensive migration report"""
         logger.info("\n" + "="*60)
@@ -234,6 +301,9 @@ class D1VideoMigration:
         logger.info(f"Successfully migrated: {self.stats['successful']}")
         logger.info(f"Failed migrations: {self.stats['failed']}")
         logger.info(f"Skipped (already exist): {self.stats['skipped']}")
+        if self.stats['skipped_after_retry']:
+            logger.info(f"  of which {self.stats['skipped_after_retry']} were in requests resent after a "
+                        f"timeout or dropped connection and may have been inserted by the lost attempt")
         
         if self.stats['total'] > 0:
             success_rate = (self.stats['successful'] / self.stats['total']) * 100
@@ -260,8 +330,6 @@ class D1VideoMigration:
 
 def main():
     """Main migration function"""
-    import argparse
-    
     parser = argparse.ArgumentParser(description='Migrate videos from SQLite to D1')
     parser.add_argument('--env', choices=['local', 'production'], default='local',
                        help='Target environment (default: local)')
@@ -303,7 +371,7 @@ def main():
         )
         
         # Execute migration
-        stats = migrator.migrate()
+        stats = asyncio.run(migrator.migrate())
         
         # Report results
         migrator.report_results()
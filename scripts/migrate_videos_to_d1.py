@@ -1,131 +1,125 @@
 import sqlite3
 import json
-from pathlib import Path
+import operator
+import os
 from typing import List, Dict, Any
 import sys
 
+from source_db import open_source_db
+
+# Columns copied to D1, in output order (title and description are excluded)
+COLUMNS = (
+    'video_id', 'cleaned_title', 'cleaned_description',
+    'channel_name', 'channel_id', 'published_at',
+    'duration_seconds', 'view_count', 'like_count',
+    'comment_count', 'is_indexed', 'created_at'
+)
+COLUMNS_CSV = ', '.join(COLUMNS)
+
+# Pulls a row's values out in COLUMNS order as a tuple
+ROW_GETTER = operator.itemgetter(*COLUMNS)
+
 class VideoMigration:
     def __init__(self, source_db: str, output_file: str, batch_size: int = 100):
         self.source_db = source_db
         self.output_file = output_file
         self.batch_size = batch_size
         self.errors = []
+        self._fh = None
+        self._renderer = None
         
     def validate_row(self, row: Dict[str, Any]) -> tuple[bool, str]:
-        """Validate a single row of data"""
+        """Validate a single row of data (a dict or sqlite3.Row with every column)"""
         # Check required fields
-        if not row.get('video_id'):
+        if not row['video_id']:
             return False, "Missing video_id"
         
         # Validate data types
         numeric_fields = ['duration_seconds', 'view_count', 'like_count', 'comment_count']
         for field in numeric_fields:
-            if row.get(field) and not isinstance(row[field], (int, type(None))):
+            if row[field] and not isinstance(row[field], (int, type(None))):
                 return False, f"Invalid type for {field}"
         
         return True, ""
     
-    def transform_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
-        """Transform row data (remove title and description)"""
-        # Create new dict without title and description
-        return {
-            'video_id': row['video_id'],
-            'cleaned_title': row.get('cleaned_title', ''),
-            'cleaned_description': row.get('cleaned_description', ''),
-            'channel_name': row.get('channel_name', ''),
-            'channel_id': row.get('channel_id', ''),
-            'published_at': row.get('published_at'),
-            'duration_seconds': row.get('duration_seconds'),
-            'view_count': row.get('view_count'),
-            'like_count': row.get('like_count'),
-            'comment_count': row.get('comment_count'),
-            'is_indexed': row.get('is_indexed', 0),
-            'created_at': row.get('created_at')
-        }
+    def _prepare_renderer(self):
+        """Create an in-memory SQLite table used to render INSERT statements"""
+        # SQLite's quote() does the literal escaping in C, so rows never go
+        # through a per-value Python escaping path. sqlite3 binds bools as 0/1,
+        # so values like is_indexed render as integers rather than True/False.
+        self._renderer = sqlite3.connect(':memory:')
+        self._renderer.execute(f"CREATE TABLE videos ({COLUMNS_CSV})")
+        self._stage_sql = f"INSERT INTO videos VALUES ({', '.join('?' * len(COLUMNS))})"
+        quoted_values = " || ', ' || ".join(f"quote({col})" for col in COLUMNS)
+        self._render_sql = (
+            f"SELECT 'INSERT INTO videos ({COLUMNS_CSV}) VALUES (' || {quoted_values} || ');' "
+            f"FROM videos ORDER BY rowid"
+        )
     
-    def escape_sql_string(self, value: Any) -> str:
-        """Properly escape SQL strings"""
-        if value is None:
-            return 'NULL'
-        if isinstance(value, (int, float)):
-            return str(value)
-        # Escape single quotes by doubling them
-        return f"'{str(value).replace(chr(39), chr(39)+chr(39))}'"
-    
-    def generate_insert_statement(self, row: Dict[str, Any]) -> str:
-        """Generate a single INSERT statement"""
-        columns = ', '.join(row.keys())
-        values = ', '.join(self.escape_sql_string(v) for v in row.values())
-        return f"INSERT INTO videos ({columns}) VALUES ({values});"
+    def _render_statements(self, rows: List[tuple]) -> List[str]:
+        """Render a batch of rows as INSERT statements"""
+        self._renderer.executemany(self._stage_sql, rows)
+        statements = [stmt for (stmt,) in self._renderer.execute(self._render_sql)]
+        self._renderer.execute("DELETE FROM videos")
+        return statements
     
     def migrate(self) -> tuple[int, int]:
         """Execute the migration"""
-        conn = sqlite3.connect(self.source_db)
+        conn = open_source_db(self.source_db)
         conn.row_factory = sqlite3.Row  # Access columns by name
         cursor = conn.cursor()
         
-        # Query all videos (excluding title and description)
-        cursor.execute("""
-            SELECT 
-                video_id,
-                cleaned_title,
-                cleaned_description,
-                channel_name,
-                channel_id,
-                published_at,
-                duration_seconds,
-                view_count,
-                like_count,
-                comment_count,
-                is_indexed,
-                created_at
-            FROM videos
-            ORDER BY created_at DESC
-        """)
-        
-        successful = 0
-        failed = 0
-        statements = []
-        
-        for row in cursor:
-            row_dict = dict(row)
+        try:
+            # Open the output once (truncating) and append every batch to the
+            # same handle; the 8 MiB buffer means most batches never hit the kernel
+            self._fh = open(self.output_file, 'w', buffering=8 << 20)
             
-            # Validate
-            is_valid, error_msg = self.validate_row(row_dict)
-            if not is_valid:
-                self.errors.append({
-                    'video_id': row_dict.get('video_id', 'UNKNOWN'),
-                    'error': error_msg
-                })
-                failed += 1
-                continue
+            # Query all videos (excluding title and description)
+            cursor.execute(f"SELECT {COLUMNS_CSV} FROM videos ORDER BY created_at DESC")
             
-            # Transform
-            transformed = self.transform_row(row_dict)
+            self._prepare_renderer()
             
-            # Generate SQL
-            sql = self.generate_insert_statement(transformed)
-            statements.append(sql)
-            successful += 1
+            successful = 0
+            failed = 0
+            rows = []
             
-            # Write in batches to avoid memory issues
-            if len(statements) >= self.batch_size:
-                self._write_batch(statements)
-                statements = []
-        
-        # Write remaining statements
-        if statements:
-            self._write_batch(statements)
-        
-        conn.close()
+            for row in cursor:
+                # Validate
+                is_valid, error_msg = self.validate_row(row)
+                if not is_valid:
+                    self.errors.append({
+                        'video_id': row['video_id'] or 'UNKNOWN',
+                        'error': error_msg
+                    })
+                    failed += 1
+                    continue
+                
+                rows.append(ROW_GETTER(row))
+                successful += 1
+                
+                # Render and write in batches to avoid memory issues
+                if len(rows) >= self.batch_size:
+                    self._write_batch(self._render_statements(rows))
+                    rows = []
+            
+            # Write remaining statements
+            if rows:
+                self._write_batch(self._render_statements(rows))
+        finally:
+            conn.close()
+            if self._renderer is not None:
+                self._renderer.close()
+            if self._fh is not None:
+                # Flush and sync to disk once, at the very end
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
         
         return successful, failed
     
     def _write_batch(self, statements: List[str]):
         """Write a batch of statements to file"""
-        mode = 'a' if Path(self.output_file).exists() else 'w'
-        with open(self.output_file, mode) as f:
-            f.write('\n'.join(statements) + '\n')
+        self._fh.write('\n'.join(statements) + '\n')
     
     def report_errors(self):
         """Generate error report"""
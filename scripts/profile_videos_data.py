@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """Profile the videos data to understand its structure"""
-import sqlite3
 import json
 
+from source_db import open_source_db
+
 def profile_videos_table(db_path: str):
-    conn = sqlite3.connect(db_path)
+    conn = open_source_db(db_path)
     cursor = conn.cursor()
     
     # Get schema
@@ -15,17 +16,43 @@ def profile_videos_table(db_path: str):
     for col in schema:
         print(f"  {col[1]}: {col[2]} {'(PK)' if col[5] else ''}")
     
-    # Get row count
-    cursor.execute("SELECT COUNT(*) FROM videos")
-    total = cursor.fetchone()[0]
+    text_columns = ['cleaned_title', 'cleaned_description', 'channel_name', 'channel_id']
+    
+    # Compute every aggregate in a single scan of the table. The quote checks
+    # have to read the full title/description text anyway, so the LENGTH()
+    # aggregates ride along on that same scan at no extra I/O.
+    null_exprs = [f"SUM(CASE WHEN {col[1]} IS NULL THEN 1 ELSE 0 END)" for col in schema]
+    empty_exprs = [f"SUM(CASE WHEN {col} = '' THEN 1 ELSE 0 END)" for col in text_columns]
+    cursor.execute(f"""
+        SELECT
+            COUNT(*),
+            {', '.join(null_exprs)},
+            {', '.join(empty_exprs)},
+            SUM(CASE WHEN cleaned_title LIKE '%''%' OR cleaned_description LIKE '%''%' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN cleaned_title LIKE '%"%' OR cleaned_description LIKE '%"%' THEN 1 ELSE 0 END),
+            AVG(LENGTH(cleaned_title)), MAX(LENGTH(cleaned_title)),
+            AVG(LENGTH(cleaned_description)), MAX(LENGTH(cleaned_description)),
+            COUNT(DISTINCT channel_id),
+            AVG(duration_seconds), MAX(duration_seconds), MIN(duration_seconds),
+            AVG(view_count), MAX(view_count)
+        FROM videos
+    """)
+    stats = list(cursor.fetchone())
+    total = stats.pop(0)
+    null_counts = [stats.pop(0) for _ in schema]
+    empty_counts = [stats.pop(0) for _ in text_columns]
+    (quote_count, dquote_count,
+     avg_title_len, max_title_len, avg_desc_len, max_desc_len,
+     unique_channels,
+     avg_dur, max_dur, min_dur,
+     avg_views, max_views) = stats
+    
     print(f"\n📊 Total Records: {total:,}")
     
     # Check for NULLs in each column
     print("\n🔍 NULL Value Analysis:")
-    for col in schema:
+    for col, null_count in zip(schema, null_counts):
         col_name = col[1]
-        cursor.execute(f"SELECT COUNT(*) FROM videos WHERE {col_name} IS NULL")
-        null_count = cursor.fetchone()[0]
         if null_count > 0:
             print(f"  {col_name}: {null_count:,} NULLs ({null_count/total*100:.1f}%)")
         else:
@@ -33,10 +60,7 @@ def profile_videos_table(db_path: str):
     
     # Check for empty strings
     print("\n📝 Empty String Analysis:")
-    text_columns = ['cleaned_title', 'cleaned_description', 'channel_name', 'channel_id']
-    for col in text_columns:
-        cursor.execute(f"SELECT COUNT(*) FROM videos WHERE {col} = ''")
-        empty_count = cursor.fetchone()[0]
+    for col, empty_count in zip(text_columns, empty_counts):
         if empty_count > 0:
             print(f"  {col}: {empty_count:,} empty ({empty_count/total*100:.1f}%)")
         else:
@@ -44,22 +68,12 @@ def profile_videos_table(db_path: str):
     
     # Check for problematic characters
     print("\n⚠️  Problematic Characters Analysis:")
-    cursor.execute("SELECT COUNT(*) FROM videos WHERE cleaned_title LIKE '%''%' OR cleaned_description LIKE '%''%'")
-    quote_count = cursor.fetchone()[0]
     print(f"  Single quotes in text: {quote_count:,} rows ({quote_count/total*100:.1f}%)")
-    
-    cursor.execute("SELECT COUNT(*) FROM videos WHERE cleaned_title LIKE '%\"%' OR cleaned_description LIKE '%\"%'")
-    dquote_count = cursor.fetchone()[0]
     print(f"  Double quotes in text: {dquote_count:,} rows ({dquote_count/total*100:.1f}%)")
     
     # Check text lengths
     print("\n📏 Text Length Analysis:")
-    cursor.execute("SELECT AVG(LENGTH(cleaned_title)), MAX(LENGTH(cleaned_title)) FROM videos")
-    avg_title_len, max_title_len = cursor.fetchone()
     print(f"  cleaned_title: avg={avg_title_len:.1f} chars, max={max_title_len:,} chars")
-    
-    cursor.execute("SELECT AVG(LENGTH(cleaned_description)), MAX(LENGTH(cleaned_description)) FROM videos")
-    avg_desc_len, max_desc_len = cursor.fetchone()
     print(f"  cleaned_description: avg={avg_desc_len:.1f} chars, max={max_desc_len:,} chars")
     
     # Sample problematic rows
@@ -77,16 +91,8 @@ def profile_videos_table(db_path: str):
     
     # Data distribution
     print("\n📈 Data Distribution:")
-    cursor.execute("SELECT COUNT(DISTINCT channel_id) FROM videos")
-    unique_channels = cursor.fetchone()[0]
     print(f"  Unique channels: {unique_channels}")
-    
-    cursor.execute("SELECT AVG(duration_seconds), MAX(duration_seconds), MIN(duration_seconds) FROM videos")
-    avg_dur, max_dur, min_dur = cursor.fetchone()
     print(f"  Duration: avg={avg_dur:.1f}s, max={max_dur:,}s, min={min_dur:,}s")
-    
-    cursor.execute("SELECT AVG(view_count), MAX(view_count) FROM videos")
-    avg_views, max_views = cursor.fetchone()
     print(f"  Views: avg={avg_views:,.0f}, max={max_views:,}")
     
     conn.close()
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""Shared read-only access to the source SQLite videos database"""
+import sqlite3
+
+def open_source_db(path: str) -> sqlite3.Connection:
+    """Open the source database tuned for large sequential reads"""
+    conn = sqlite3.connect(path)
+    # Read-side tuning: 256 MiB page cache, in-memory temp b-trees for
+    # ORDER BY sorts and aggregates, and 1 GiB mmap so pages are read
+    # straight from the file
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=1073741824")
+    return conn
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Shared SQL statement splitter for the migration test and validation scripts"""
+import sqlite3
+from typing import Iterator
+
+def split_sql_statements(content: str) -> Iterator[str]:
+    """Yield SQL statements split on semicolons outside string literals"""
+    start = 0
+    end = content.find(';')
+
+    # Only semicolons are candidate boundaries; SQLite's own C tokenizer
+    # (sqlite3_complete) decides whether one closes the statement or sits
+    # inside a string literal or comment
+    while end != -1:
+        end += 1
+        if sqlite3.complete_statement(content[start:end]):
+            statement = content[start:end].strip()
+            if statement:
+                yield statement
+            start = end
+        end = content.find(';', end)
+
+def find_unescaped_quote_issue(text: str) -> bool:
+    """Return True if text has a quoted span followed by another quote ('...'...')"""
+    # Same result as re.search(r"'[^']*'[^']*'", text), which can only match
+    # when the text holds at least three quotes, but a single C-level count
+    # with no regex engine or backtracking
+    return text.count("'") >= 3
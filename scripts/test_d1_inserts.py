@@ -4,210 +4,257 @@ D1 Database Insert Testing Script
 Analyzes and tests INSERT statements for the videos table
 """
 
+import argparse
+import functools
+import os
 import re
 import sqlite3
+import sys
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 
-def analyze_insert_statements(filepath: str) -> Tuple[List[str], List[str]]:
+from sql_statements import split_sql_statements, find_unescaped_quote_issue
+
+# Schema of the local test videos table
+_VIDEOS_TABLE_SQL = '''
+    CREATE TABLE videos (
+        video_id TEXT PRIMARY KEY,
+        cleaned_title TEXT,
+        cleaned_description TEXT,
+        channel_name TEXT,
+        channel_id TEXT,
+        published_at TIMESTAMP,
+        duration_seconds INTEGER,
+        view_count INTEGER,
+        like_count INTEGER,
+        comment_count INTEGER,
+        is_indexed BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Expected column order for videos table
+_EXPECTED_COLUMNS = (
+    'video_id', 'cleaned_title', 'cleaned_description', 
+    'channel_name', 'channel_id', 'published_at', 
+    'duration_seconds', 'view_count', 'like_count', 
+    'comment_count', 'is_indexed', 'created_at'
+)
+_EXPECTED_COUNT = len(_EXPECTED_COLUMNS)
+
+# Fixed template text, emitted ahead of each multi-row INSERT
+_FIXED_TEMPLATE_HEADER = '-- Fixed INSERT statements with explicit column specification\n'
+_FIXED_INSERT_PREFIX = '''INSERT INTO videos (
+    video_id, cleaned_title, cleaned_description, 
+    channel_name, channel_id, published_at, 
+    duration_seconds, view_count, like_count, 
+    comment_count, is_indexed, created_at
+) VALUES '''
+
+# SQLite's default limit on bound parameters in one statement
+_SQLITE_MAX_PARAMS = 999
+
+# Patterns used per statement, compiled once at import time
+_INSERT_COLS_RE = re.compile(r'INSERT INTO videos \(([^)]+)\)')
+_VALUES_RE = re.compile(r'VALUES\s*\((.*)\)', re.DOTALL)
+_INSERT_PARTS_RE = re.compile(r'INSERT INTO videos\s*(?:\(([^)]*)\))?\s*VALUES\s*\((.*)\)\s*;?\s*$', re.DOTALL)
+
+@functools.lru_cache(maxsize=8)
+def _split_cached(path: str, mtime: float, size: int) -> Tuple[str, ...]:
+    """Split a SQL file once per (path, mtime, size) so repeat callers share the result"""
+    return tuple(split_sql_statements(Path(path).read_text()))
+
+def load_statements(path: str) -> Tuple[str, ...]:
+    """Return the statements in a SQL file, re-splitting only when it changes"""
+    st = os.stat(path)
+    return _split_cached(path, st.st_mtime, st.st_size)
+
+def analyze_insert_statements(filepath: str, verbose: bool = False) -> Tuple[List[str], List[str]]:
     """Analyze INSERT statements for issues"""
     errors = []
     warnings = []
-    
-    with open(filepath, 'r') as f:
-        content = f.read()
+    messages = []
     
     # Split into individual INSERT statements
-    statements = []
-    current_statement = ""
-    in_string = False
-    escape_next = False
+    statements = load_statements(filepath)
     
-    for char in content:
-        current_statement += char
-        
-        if escape_next:
-            escape_next = False
-            continue
-            
-        if char == '\\':
-            escape_next = True
-            continue
-            
-        if char == "'" and not escape_next:
-            in_string = not in_string
-            
-        if char == ';' and not in_string:
-            if current_statement.strip():
-                statements.append(current_statement.strip())
-            current_statement = ""
-    
-    print(f"📊 Found {len(statements)} INSERT statements")
-    
-    # Expected column order for videos table
-    expected_columns = [
-        'video_id', 'cleaned_title', 'cleaned_description', 
-        'channel_name', 'channel_id', 'published_at', 
-        'duration_seconds', 'view_count', 'like_count', 
-        'comment_count', 'is_indexed', 'created_at'
-    ]
+    messages.append(f"📊 Found {len(statements)} INSERT statements\n")
     
     for i, stmt in enumerate(statements, 1):
-        print(f"\n🔍 Analyzing statement {i}:")
+        if verbose:
+            messages.append(f"\n🔍 Analyzing statement {i}:\n")
         
         # Check if it specifies columns
         if 'INSERT INTO videos (' in stmt:
-            print("  ✅ Uses explicit column specification")
+            if verbose:
+                messages.append("  ✅ Uses explicit column specification\n")
             # Extract column list
-            columns_match = re.search(r'INSERT INTO videos \(([^)]+)\)', stmt)
+            columns_match = _INSERT_COLS_RE.search(stmt)
             if columns_match:
                 columns = [col.strip() for col in columns_match.group(1).split(',')]
-                print(f"  📝 Columns: {len(columns)} specified")
-                if len(columns) != len(expected_columns):
-                    warnings.append(f"Statement {i}: Expected {len(expected_columns)} columns, got {len(columns)}")
+                if verbose:
+                    messages.append(f"  📝 Columns: {len(columns)} specified\n")
+                if len(columns) != _EXPECTED_COUNT:
+                    warnings.append(f"Statement {i}: Expected {_EXPECTED_COUNT} columns, got {len(columns)}")
         else:
-            print("  ⚠️  Uses implicit column order (dangerous!)")
+            if verbose:
+                messages.append("  ⚠️  Uses implicit column order (dangerous!)\n")
             warnings.append(f"Statement {i}: Should specify explicit column names")
         
         # Count values in VALUES clause
-        values_match = re.search(r'VALUES\s*\((.*)\)', stmt, re.DOTALL)
+        values_match = _VALUES_RE.search(stmt)
         if values_match:
             values_str = values_match.group(1)
             # Simple count of comma-separated values (rough estimate)
             values_count = values_str.count(',') + 1
-            print(f"  📊 Values count: {values_count}")
+            if verbose:
+                messages.append(f"  📊 Values count: {values_count}\n")
             
             if 'INSERT INTO videos (' not in stmt:  # Implicit order
-                if values_count != len(expected_columns):
-                    errors.append(f"Statement {i}: Expected {len(expected_columns)} values, got {values_count}")
+                if values_count != _EXPECTED_COUNT:
+                    errors.append(f"Statement {i}: Expected {_EXPECTED_COUNT} values, got {values_count}")
+        
+        if not verbose:
+            continue
         
         # Check for potential issues
         if 'replace(' in stmt:
-            print("  🔧 Uses replace() function")
+            messages.append("  🔧 Uses replace() function\n")
             
         # Check for unescaped quotes
-        if re.search(r"'[^']*'[^']*'", stmt) and "VALUES" in stmt:
-            print("  ⚠️  Potential unescaped quotes detected")
+        if "VALUES" in stmt and find_unescaped_quote_issue(stmt):
+            messages.append("  ⚠️  Potential unescaped quotes detected\n")
     
+    # One write for the whole report instead of a print per line
+    sys.stdout.write(''.join(messages))
     return errors, warnings
 
-def create_test_database() -> str:
-    """Create a temporary SQLite database for testing"""
-    db_path = "/tmp/test_videos.db"
+def create_test_database() -> sqlite3.Connection:
+    """Create an in-memory SQLite database for testing"""
+    # Nothing touches disk and every run starts from an empty table.
+    # Transactions are managed explicitly so each test batch lands in one
+    # BEGIN ... COMMIT
+    conn = sqlite3.connect(":memory:", isolation_level=None)
     
     # Create videos table
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn.execute(_VIDEOS_TABLE_SQL)
     
-    cursor.execute('''
-        CREATE TABLE videos (
-            video_id TEXT PRIMARY KEY,
-            cleaned_title TEXT,
-            cleaned_description TEXT,
-            channel_name TEXT,
-            channel_id TEXT,
-            published_at TIMESTAMP,
-            duration_seconds INTEGER,
-            view_count INTEGER,
-            like_count INTEGER,
-            comment_count INTEGER,
-            is_indexed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    return conn
+
+def _extract_values_tuples(statements: List[str], conn: sqlite3.Connection,
+                           columns: List[str]) -> Optional[List[tuple]]:
+    """Parse single-row INSERT statements into value tuples (None if any doesn't fit)"""
+    rows = []
+    for stmt in statements:
+        match = _INSERT_PARTS_RE.match(stmt)
+        if not match:
+            return None
+        
+        # Explicit column lists must match the table's column order
+        if match.group(1) is not None:
+            if [col.strip() for col in match.group(1).split(',')] != columns:
+                return None
+        
+        try:
+            # Let SQLite evaluate the literals (including replace() calls)
+            row = conn.execute("SELECT " + match.group(2)).fetchone()
+        except sqlite3.Error:
+            return None
+        
+        if len(row) != len(columns):
+            return None
+        rows.append(row)
     
-    return db_path
+    return rows
 
-def test_inserts_with_sqlite(sql_file: str, db_path: str) -> List[str]:
+def test_inserts_with_sqlite(sql_file: str, conn: sqlite3.Connection, verbose: bool = False) -> List[str]:
     """Test INSERT statements using SQLite (local testing)"""
     errors = []
+    messages = []
     
-    with open(sql_file, 'r') as f:
-        content = f.read()
-    
-    # Split into statements
-    statements = []
-    current_statement = ""
-    in_string = False
-    escape_next = False
-    
-    for char in content:
-        current_statement += char
-        
-        if escape_next:
-            escape_next = False
-            continue
-            
-        if char == '\\':
-            escape_next = True
-            continue
-            
-        if char == "'" and not escape_next:
-            in_string = not in_string
-            
-        if char == ';' and not in_string:
-            if current_statement.strip():
-                statements.append(current_statement.strip())
-            current_statement = ""
+    # Split into statements (shared with analyze_insert_statements)
+    statements = load_statements(sql_file)
     
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    for i, stmt in enumerate(statements, 1):
+    # Fast path: load every row through one prepared statement
+    columns = [col[1] for col in cursor.execute("PRAGMA table_info(videos)")]
+    rows = _extract_values_tuples(statements, conn, columns)
+    if rows is not None:
+        template = f"INSERT INTO videos ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
         try:
-            print(f"🧪 Testing statement {i}...")
-            cursor.execute(stmt)
-            print(f"  ✅ Success")
-        except Exception as e:
-            error_msg = f"Statement {i} failed: {str(e)}"
-            print(f"  ❌ {error_msg}")
-            errors.append(error_msg)
-    
-    conn.commit()
+            messages.append(f"🧪 Testing {len(rows)} statements with executemany...\n")
+            cursor.execute("BEGIN")
+            cursor.executemany(template, rows)
+            cursor.execute("COMMIT")
+            messages.append("  ✅ Success\n")
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK")
+            messages.append(f"  ⚠️  Bulk insert failed ({e}), testing statements one by one\n")
+            rows = None
+    
+    # Slow path: execute statements individually to report each failure
+    if rows is None:
+        cursor.execute("BEGIN")
+        
+        for i, stmt in enumerate(statements, 1):
+            try:
+                if verbose:
+                    messages.append(f"🧪 Testing statement {i}...\n")
+                cursor.execute(stmt)
+                if verbose:
+                    messages.append("  ✅ Success\n")
+            except Exception as e:
+                error_msg = f"Statement {i} failed: {str(e)}"
+                messages.append(f"  ❌ {error_msg}\n")
+                errors.append(error_msg)
+        
+        cursor.execute("COMMIT")
     
     # Check what was inserted
     cursor.execute("SELECT COUNT(*) FROM videos")
     count = cursor.fetchone()[0]
-    print(f"\n📊 Total records inserted: {count}")
+    messages.append(f"\n📊 Total records inserted: {count}\n")
     
     if count > 0:
         cursor.execute("SELECT video_id, cleaned_title, channel_name FROM videos LIMIT 3")
         sample = cursor.fetchall()
-        print("📋 Sample data:")
+        messages.append("📋 Sample data:\n")
         for row in sample:
-            print(f"  - {row[0]}: {row[1]} ({row[2]})")
+            messages.append(f"  - {row[0]}: {row[1]} ({row[2]})\n")
     
-    conn.close()
+    sys.stdout.write(''.join(messages))
     return errors
 
 def generate_fixed_inserts(original_file: str) -> str:
     """Generate a fixed version of INSERT statements with explicit columns"""
+    # One row per original statement; the split cache means the file
+    # isn't read again
+    row_count = len(load_statements(original_file))
     
-    with open(original_file, 'r') as f:
-        content = f.read()
+    # One multi-row INSERT per chunk, with as many rows per statement as the
+    # bound-parameter limit allows (83 rows of 12 columns)
+    rows_per_insert = _SQLITE_MAX_PARAMS // _EXPECTED_COUNT
+    row_placeholders = '(' + ', '.join('?' * _EXPECTED_COUNT) + ')'
     
-    # This is a template for fixed INSERT statements
-    fixed_template = '''-- Fixed INSERT statements with explicit column specification
-INSERT INTO videos (
-    video_id, cleaned_title, cleaned_description, 
-    channel_name, channel_id, published_at, 
-    duration_seconds, view_count, like_count, 
-    comment_count, is_indexed, created_at
-) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-'''
+    parts = [_FIXED_TEMPLATE_HEADER]
+    for start in range(0, row_count, rows_per_insert):
+        chunk_size = min(rows_per_insert, row_count - start)
+        parts.append(_FIXED_INSERT_PREFIX + ', '.join([row_placeholders] * chunk_size) + ';\n')
     
-    return fixed_template
+    return ''.join(parts)
 
 def main():
+    parser = argparse.ArgumentParser(description='Analyze and test D1 INSERT statements')
+    parser.add_argument('--verbose', action='store_true', help='Report every statement individually')
+    args = parser.parse_args()
+    
     print("🚀 D1 Database Insert Testing Tool")
     print("=" * 50)
     
     # Analyze the test file
     sql_file = "db/mutations/test_5.sql"
-    errors, warnings = analyze_insert_statements(sql_file)
+    errors, warnings = analyze_insert_statements(sql_file, verbose=args.verbose)
     
     print(f"\n📋 Analysis Results:")
     print(f"  ❌ Errors: {len(errors)}")
@@ -225,8 +272,9 @@ def main():
     
     # Test with SQLite
     print(f"\n🧪 Testing with SQLite...")
-    db_path = create_test_database()
-    test_errors = test_inserts_with_sqlite(sql_file, db_path)
+    conn = create_test_database()
+    test_errors = test_inserts_with_sqlite(sql_file, conn, verbose=args.verbose)
+    conn.close()
     
     if test_errors:
         print(f"\n❌ SQLite Test Failures:")
@@ -238,9 +286,7 @@ def main():
     # Generate fixed version
     print(f"\n🔧 Generating fixed INSERT template...")
     fixed_template = generate_fixed_inserts(sql_file)
-    
-    with open("db/mutations/test_5_fixed.sql", "w") as f:
-        f.write(fixed_template)
+    Path("db/mutations/test_5_fixed.sql").write_text(fixed_template)
     
     print(f"📝 Fixed template saved to: db/mutations/test_5_fixed.sql")
     
@@ -12,7 +12,8 @@ def validate_sql_file(file_path: str) -> tuple[int, list]:
     line_count = 0
     
     try:
-        with open(file_path, 'r') as f:
+        # Bytes scan; see validate_migration
+        with open(file_path, 'rb') as f:
             for line_num, line in enumerate(f, 1):
                 line_count += 1
                 line = line.strip()
@@ -21,16 +22,16 @@ def validate_sql_file(file_path: str) -> tuple[int, list]:
                     continue
                 
                 # Check it's an INSERT statement
-                if not line.startswith('INSERT INTO videos'):
+                if not line.startswith(b'INSERT INTO videos'):
                     errors.append(f"Line {line_num}: Not an INSERT statement")
                     continue
                 
                 # Check it ends with semicolon
-                if not line.endswith(';'):
+                if not line.endswith(b';'):
                     errors.append(f"Line {line_num}: Missing semicolon")
                 
                 # Check for basic syntax issues
-                if line.count("'") % 2 != 0:
+                if line.count(b"'") % 2 != 0:
                     errors.append(f"Line {line_num}: Unbalanced quotes")
                     
     except FileNotFoundError:
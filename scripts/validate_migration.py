@@ -1,36 +1,38 @@
+from pathlib import Path
 from typing import List
 
 def validate_sql_file(filepath: str) -> tuple[int, List[str]]:
     """Validate generated SQL file"""
     errors = []
-    line_count = 0
     
-    with open(filepath, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line_count += 1
-            line = line.strip()
-            
-            if not line:
-                continue
-            
-            # Check it's an INSERT statement
-            if not line.startswith('INSERT INTO videos'):
-                errors.append(f"Line {line_num}: Not an INSERT statement")
-                continue
-            
-            # Check it ends with semicolon
-            if not line.endswith(';'):
-                errors.append(f"Line {line_num}: Missing semicolon")
-            
-            # Check for empty string values in critical fields
-            if "'', ''" in line:
-                errors.append(f"Line {line_num}: Contains empty critical fields")
-            
-            # Check for unescaped quotes (basic check)
-            # Count single quotes - should be even
-            quote_count = line.count("'")
-            if quote_count % 2 != 0:
-                errors.append(f"Line {line_num}: Unbalanced quotes")
+    # Read once and scan raw bytes; every check is ASCII, so no decoding is needed
+    lines = Path(filepath).read_bytes().splitlines()
+    line_count = len(lines)
+    
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        
+        if not line:
+            continue
+        
+        # Check it's an INSERT statement
+        if not line.startswith(b'INSERT INTO videos'):
+            errors.append(f"Line {line_num}: Not an INSERT statement")
+            continue
+        
+        # Check it ends with semicolon
+        if not line.endswith(b';'):
+            errors.append(f"Line {line_num}: Missing semicolon")
+        
+        # Check for empty string values in critical fields
+        if b"'', ''" in line:
+            errors.append(f"Line {line_num}: Contains empty critical fields")
+        
+        # Check for unescaped quotes (basic check)
+        # Count single quotes - should be even
+        quote_count = line.count(b"'")
+        if quote_count % 2 != 0:
+            errors.append(f"Line {line_num}: Unbalanced quotes")
     
     return line_count, errors
 
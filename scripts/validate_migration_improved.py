@@ -1,104 +1,120 @@
 #!/usr/bin/env python3
 """Improved validation script that handles multi-line SQL statements"""
+import itertools
 import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import List, Tuple
 
-def validate_sql_file(filepath: str) -> Tuple[int, List[str]]:
-    """Validate generated SQL file - handles multi-line statements"""
+from sql_statements import split_sql_statements, find_unescaped_quote_issue
+
+# Files at least this large are validated in a process pool
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# Statements handed to a worker process per task
+PARALLEL_CHUNKSIZE = 32
+
+# Patterns used on every line, compiled once at import time
+_QUOTE_THEN_ALPHA_RE = re.compile(r"'[^']*'[a-zA-Z]")
+
+# Everything the structural checks count: backslash escapes, parens, quotes, VALUES
+_STRUCTURE_TOKEN_RE = re.compile(r"\\([\s\S])|[()']|VALUES")
+
+def _count_structure(statement: str) -> Tuple[int, int, int, int]:
+    """Count open parens, close parens, unescaped quotes and VALUES in one pass"""
+    open_parens = close_parens = real_quotes = values_count = 0
+    
+    for match in _STRUCTURE_TOKEN_RE.finditer(statement):
+        token = match.group()
+        escaped = match.group(1)
+        if escaped is not None:
+            # Escapes only hide quotes; parens and VALUES still count
+            if escaped == '(':
+                open_parens += 1
+            elif escaped == ')':
+                close_parens += 1
+            elif escaped == 'V' and statement.startswith('ALUES', match.end()):
+                values_count += 1
+        elif token == '(':
+            open_parens += 1
+        elif token == ')':
+            close_parens += 1
+        elif token == "'":
+            real_quotes += 1
+        else:
+            values_count += 1
+    
+    return open_parens, close_parens, real_quotes, values_count
+
+def _validate_statement(stmt_num: int, statement: str) -> List[str]:
+    """Run the structural checks on one statement (top-level so worker processes can pickle it)"""
     errors = []
-    statement_count = 0
     
-    with open(filepath, 'r') as f:
-        content = f.read()
+    # Check it's an INSERT statement
+    if not statement.startswith('INSERT INTO videos'):
+        errors.append(f"Statement {stmt_num}: Not an INSERT statement")
+        return errors
+    
+    # Check it starts with proper syntax
+    if not statement.startswith('INSERT INTO videos ('):
+        errors.append(f"Statement {stmt_num}: Invalid INSERT syntax")
+    
+    # Check for VALUES keyword
+    if 'VALUES (' not in statement:
+        errors.append(f"Statement {stmt_num}: Missing VALUES clause")
+    
+    # Single scan for parens, unescaped quotes and VALUES occurrences
+    open_parens, close_parens, real_quotes, values_count = _count_structure(statement)
+    
+    # Check for balanced parentheses
+    if open_parens != close_parens:
+        errors.append(f"Statement {stmt_num}: Unbalanced parentheses ({open_parens} open, {close_parens} close)")
+    
+    # Real quotes (not escaped) should be even
+    if real_quotes % 2 != 0:
+        errors.append(f"Statement {stmt_num}: Unbalanced quotes ({real_quotes} quotes)")
+    
+    # Check for empty critical fields (but be more lenient)
+    # Empty channel_id is acceptable based on our data analysis
+    if "'', '', '', ''" in statement:
+        errors.append(f"Statement {stmt_num}: Contains multiple empty fields")
+    
+    # Basic structure validation
+    if values_count != 1:
+        errors.append(f"Statement {stmt_num}: Should have exactly one VALUES clause")
+    
+    return errors
+
+def validate_sql_file(content: str) -> Tuple[int, List[str]]:
+    """Validate generated SQL content - handles multi-line statements"""
+    errors = []
+    statement_count = 0
     
     # Split by semicolons to get individual statements
     # But be careful not to split on semicolons inside strings
-    statements = []
-    current_statement = ""
-    in_string = False
-    escape_next = False
-    
-    for char in content:
-        current_statement += char
-        
-        if escape_next:
-            escape_next = False
-            continue
-            
-        if char == '\\':
-            escape_next = True
-            continue
-            
-        if char == "'" and not escape_next:
-            in_string = not in_string
-            
-        if char == ';' and not in_string:
-            statements.append(current_statement.strip())
-            current_statement = ""
-    
-    # Process each complete statement
-    for stmt_num, statement in enumerate(statements, 1):
-        if not statement.strip():
-            continue
-            
+    statements = split_sql_statements(content)
+    
+    # Statements are independent, so large files are checked across worker
+    # processes (the checks are pure Python, so threads would hold the GIL).
+    # Smaller files stay serial, where pool start-up would cost more than it saves
+    if len(content) >= PARALLEL_MIN_BYTES:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(_validate_statement, itertools.count(1), statements,
+                                        chunksize=PARALLEL_CHUNKSIZE))
+    else:
+        results = map(_validate_statement, itertools.count(1), statements)
+    
+    # Merge per-statement errors in statement order
+    for statement_errors in results:
         statement_count += 1
-        
-        # Check it's an INSERT statement
-        if not statement.strip().startswith('INSERT INTO videos'):
-            errors.append(f"Statement {stmt_num}: Not an INSERT statement")
-            continue
-        
-        # Check it starts with proper syntax
-        if not statement.strip().startswith('INSERT INTO videos ('):
-            errors.append(f"Statement {stmt_num}: Invalid INSERT syntax")
-        
-        # Check for VALUES keyword
-        if 'VALUES (' not in statement:
-            errors.append(f"Statement {stmt_num}: Missing VALUES clause")
-        
-        # Check for balanced parentheses
-        open_parens = statement.count('(')
-        close_parens = statement.count(')')
-        if open_parens != close_parens:
-            errors.append(f"Statement {stmt_num}: Unbalanced parentheses ({open_parens} open, {close_parens} close)")
-        
-        # Count single quotes - should be even (they come in pairs)
-        # But be smarter about this - ignore escaped quotes
-        quote_positions = []
-        escape_next = False
-        for i, char in enumerate(statement):
-            if escape_next:
-                escape_next = False
-                continue
-            if char == '\\':
-                escape_next = True
-                continue
-            if char == "'":
-                quote_positions.append(i)
-        
-        # Real quotes (not escaped) should be even
-        real_quotes = len(quote_positions)
-        if real_quotes % 2 != 0:
-            errors.append(f"Statement {stmt_num}: Unbalanced quotes ({real_quotes} quotes)")
-        
-        # Check for empty critical fields (but be more lenient)
-        # Empty channel_id is acceptable based on our data analysis
-        if "'', '', '', ''" in statement:
-            errors.append(f"Statement {stmt_num}: Contains multiple empty fields")
-        
-        # Basic structure validation
-        if statement.count('VALUES') != 1:
-            errors.append(f"Statement {stmt_num}: Should have exactly one VALUES clause")
+        errors.extend(statement_errors)
     
     return statement_count, errors
 
-def validate_specific_issues(filepath: str) -> List[str]:
+def validate_specific_issues(content: str) -> List[str]:
     """Check for specific known issues in the data"""
     issues = []
     
-    with open(filepath, 'r') as f:
-        content = f.read()
-    
     # Check for the specific problematic patterns we found in data analysis
     if "channel_id" in content and "''" in content:
         # This is actually fine - we know all channel_id fields are empty
@@ -108,9 +124,9 @@ def validate_specific_issues(filepath: str) -> List[str]:
     lines = content.split('\n')
     for line_num, line in enumerate(lines, 1):
         # Look for patterns like 'text'text' (unescaped)
-        if re.search(r"'[^']*'[^']*'", line) and "VALUES" in line:
+        if "VALUES" in line and find_unescaped_quote_issue(line):
             # This might be an issue, but let's be more specific
-            if re.search(r"'[^']*'[a-zA-Z]", line):  # Quote followed by letter (not comma, paren, or quote)
+            if _QUOTE_THEN_ALPHA_RE.search(line):  # Quote followed by letter (not comma, paren, or quote)
                 issues.append(f"Line {line_num}: Possible unescaped single quote")
     
     return issues
@@ -121,8 +137,11 @@ if __name__ == "__main__":
     print(f"🔍 Validating {filepath}...")
     print("📝 Using improved multi-line statement validation...\n")
     
-    count, errors = validate_sql_file(filepath)
-    specific_issues = validate_specific_issues(filepath)
+    # Read once; both checks and the stats below share the same string
+    content = Path(filepath).read_text()
+    
+    count, errors = validate_sql_file(content)
+    specific_issues = validate_specific_issues(content)
     
     print(f"📊 Validation Results:")
     print(f"  📝 Total statements: {count}")
@@ -153,15 +172,13 @@ if __name__ == "__main__":
     
     # Show a sample of the actual SQL for verification
     print(f"\n📋 Sample SQL (first 200 chars):")
-    with open(filepath, 'r') as f:
-        first_line = f.readline().strip()
-        print(f"   {first_line[:200]}...")
+    first_newline = content.find('\n')
+    first_line = (content if first_newline == -1 else content[:first_newline]).strip()
+    print(f"   {first_line[:200]}...")
     
     # Count actual INSERT statements
-    with open(filepath, 'r') as f:
-        content = f.read()
-        insert_count = content.count('INSERT INTO videos')
-        print(f"\n📊 Quick Stats:")
-        print(f"   INSERT statements found: {insert_count}")
-        print(f"   Expected: 410")
-        print(f"   Match: {'✅' if insert_count == 410 else '❌'}")
\ No newline at end of file
+    insert_count = content.count('INSERT INTO videos')
+    print(f"\n📊 Quick Stats:")
+    print(f"   INSERT statements found: {insert_count}")
+    print(f"   Expected: 410")
+    print(f"   Match: {'✅' if insert_count == 410 else '❌'}")
\ No newline at end of file